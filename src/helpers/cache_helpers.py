@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import pandas as pd
+
+
+def text_hash(text):
+    """
+    Compute the SHA-256 hex digest of a text value.
+
+    Args:
+        text (Any): The value to hash. Non-string values are converted with str().
+
+    Returns:
+        str: The hex digest of the UTF-8 encoded text.
+    """
+    return hashlib.sha256(str(text).encode('utf-8')).hexdigest()
+
+
+def frame_hash(df):
+    """
+    Compute a SHA-256 hex digest of a DataFrame's columns, dtypes and full content.
+
+    Args:
+        df (pandas.DataFrame): The DataFrame to hash.
+
+    Returns:
+        str: The hex digest, identical for DataFrames with the same schema and values.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe key/value store that evicts the least recently used entry once full.
+    """
+    def __init__(self, maxsize=128):
+        """
+        Parameters:
+        - maxsize: maximum number of entries kept before the oldest one is evicted.
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value stored under key (marking it as recently used), or default if missing.
+        """
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        """
+        Store value under key, evicting the least recently used entry if the cache is full.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
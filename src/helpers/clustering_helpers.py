@@ -1,10 +1,351 @@
 from sklearn.model_selection import ParameterGrid
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+from scipy import sparse
 import numpy as np
 from sklearn import metrics
 import itertools
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.base import BaseEstimator, TransformerMixin
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, TruncatedSVD
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+
+try:
+    from numba import config as numba_config, njit, prange, set_num_threads
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional, scikit-learn's DBSCAN is used without it
+    NUMBA_AVAILABLE = False
+
+# Minimum number of samples above which the numba DBSCAN implementation is used
+NUMBA_DBSCAN_MIN_SAMPLES = 5000
+
+# Grid search workers are started from a single-threaded fork server (or spawned where it is
+# unavailable) rather than forked from a thread that may hold locks of running thread pools
+_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def split_column_types(df, columns):
+    """
+    Split columns into numeric and categorical ones.
+
+    The dtypes inferred by the CSV parser are reused directly: numeric and boolean
+    columns are numeric, every other column is categorical.
+
+    Args:
+        df (pandas.DataFrame): The input data.
+        columns (list): The column names to classify.
+
+    Returns:
+        tuple: A tuple containing:
+            - list: The numeric column names.
+            - list: The categorical column names.
+    """
+    numeric = set(df[columns].select_dtypes(include=[np.number, 'bool']).columns)
+
+    numeric_cols = [column for column in columns if column in numeric]
+    categorical_cols = [column for column in columns if column not in numeric]
+    return numeric_cols, categorical_cols
+
+
+def preprocess_features(df, numeric_cols, categorical_cols, do_mfa=False, n_components_global=2,
+                        reduce_dims=None):
+    """
+    Impute, scale and encode the data into a feature matrix ready for clustering.
+
+    Numeric columns are mean-imputed and scaled to unit variance, categorical columns
+    are imputed with their most frequent value and one-hot encoded. The result is a
+    sparse CSR matrix when the one-hot encoding makes it mostly zeros, and a dense
+    array otherwise. Optionally, the features are reduced to a few dimensions, either
+    by combining the two groups of features with a Multiple Factor Analysis, or with a
+    truncated SVD, which keeps distance computations and neighbor searches in DBSCAN
+    cheap on wide one-hot encoded data.
+
+    Args:
+        df (pandas.DataFrame): The input data.
+        numeric_cols (list): The numeric column names.
+        categorical_cols (list): The categorical column names.
+        do_mfa (bool): Whether to reduce the features with CustomMFA.
+        n_components_global (int): The number of global components for MFA.
+        reduce_dims (int, optional): The number of dimensions to keep with a truncated SVD
+            when MFA is not used. No reduction is applied if None or if the features
+            already have at most this many dimensions.
+
+    Returns:
+        array or scipy.sparse.csr_matrix: The preprocessed features.
+    """
+    # Create preprocessing pipeline
+    categorical_pipeline = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),  # Use most frequent for categorical data
+        ('encoder', OneHotEncoder(handle_unknown='ignore', sparse_output=True))
+    ])
+
+    # Centering does not change euclidean distances, and skipping it keeps the output sparse-compatible
+    numerical_pipeline = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean')),
+        ('scaler', StandardScaler(with_mean=False))
+    ])
+
+    # Create the full preprocessing pipeline
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', numerical_pipeline, numeric_cols),
+            ('cat', categorical_pipeline, categorical_cols)
+        ],
+        remainder='drop'
+    )
+
+    # Fit and transform the data using the preprocessing pipeline
+    features_scaled = preprocessor.fit_transform(df)
+
+    if do_mfa:
+        n_numeric = len(numeric_cols)
+        n_cat_encoded = features_scaled.shape[1]- n_numeric
+        group_numeric = np.arange(0, n_numeric)
+        group_cat = np.arange(n_numeric, n_numeric + n_cat_encoded)
+        groups = [group_numeric, group_cat]
+
+        # Apply MFA on the already preprocessed features instead of refitting the preprocessor
+        mfa = CustomMFA(groups=groups, n_components_global=n_components_global)
+        features_scaled = mfa.fit_transform(features_scaled)
+
+    elif reduce_dims is not None and features_scaled.shape[1] > reduce_dims:
+        # TruncatedSVD works directly on sparse input, unlike PCA
+        svd = TruncatedSVD(n_components=reduce_dims, random_state=0)
+        features_scaled = svd.fit_transform(features_scaled)
+
+    return features_scaled
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _core_points_numba_parallel(indptr, distances, eps, min_samples):
+        """
+        Flag the points with at least min_samples neighbors within eps, in parallel.
+        """
+        n_samples = len(indptr) - 1
+        is_core = np.empty(n_samples, dtype=np.bool_)
+        for i in prange(n_samples):
+            is_core[i] = np.sum(distances[indptr[i]:indptr[i + 1]] <= eps) >= min_samples
+        return is_core
+
+    @njit(cache=True)
+    def _core_points_numba(indptr, distances, eps, min_samples):
+        """
+        Flag the points with at least min_samples neighbors within eps.
+        """
+        n_samples = len(indptr) - 1
+        is_core = np.empty(n_samples, dtype=np.bool_)
+        for i in range(n_samples):
+            is_core[i] = np.sum(distances[indptr[i]:indptr[i + 1]] <= eps) >= min_samples
+        return is_core
+
+    @njit(cache=True)
+    def _expand_clusters_numba(indptr, indices, distances, eps, is_core):
+        """
+        Label the clusters reachable from the core points of a radius neighbors graph in CSR form.
+
+        Clusters are expanded from each unvisited core point with a breadth-first search
+        over a fixed-size stack, only following graph edges with a distance of at most eps.
+        Points are labeled when pushed, so each point enters the stack at most once.
+        """
+        n_samples = len(indptr) - 1
+        labels = np.full(n_samples, -1, dtype=np.int64)
+        stack = np.empty(n_samples, dtype=np.int32)
+        label_num = 0
+        for i in range(n_samples):
+            if labels[i] != -1 or not is_core[i]:
+                continue
+            labels[i] = label_num
+            stack[0] = i
+            top = 1
+            while top > 0:
+                top -= 1
+                point = stack[top]
+                if not is_core[point]:
+                    continue
+                for j in range(indptr[point], indptr[point + 1]):
+                    neighbor = indices[j]
+                    if distances[j] <= eps and labels[neighbor] == -1:
+                        labels[neighbor] = label_num
+                        stack[top] = neighbor
+                        top += 1
+            label_num += 1
+        return labels
+
+
+def _dbscan_numba(graph, eps, min_samples, parallel=False):
+    """
+    Label points with DBSCAN given a radius neighbors graph, using the numba kernels.
+
+    Args:
+        graph (scipy.sparse.csr_matrix): The radius neighbors graph, as computed by _radius_neighbors_graph.
+        eps (float): The maximum distance between two neighbors, at most the graph radius.
+        min_samples (int): The number of neighbors, the point included, for a point to be a core point.
+        parallel (bool): Whether to find the core points with numba's thread pool. Only used in
+            the grid search worker processes, as the pool is not shut down cleanly from other threads.
+
+    Returns:
+        numpy.ndarray: The cluster labels, with -1 for noise points.
+    """
+    core_points = _core_points_numba_parallel if parallel else _core_points_numba
+    is_core = core_points(graph.indptr, graph.data, eps, min_samples)
+    return _expand_clusters_numba(graph.indptr, graph.indices, graph.data, eps, is_core)
+
+
+def _use_numba_dbscan(features):
+    """
+    Whether the numba DBSCAN implementation should be used for these features.
+    """
+    return NUMBA_AVAILABLE and features.shape[0] > NUMBA_DBSCAN_MIN_SAMPLES
+
+
+def _radius_neighbors_graph(features, radius):
+    """
+    Compute the sparse graph of distances between every point and its neighbors within radius.
+
+    Each point is included as its own neighbor, and each row is sorted by distance so
+    the graph can be passed to DBSCAN with metric='precomputed' for any eps <= radius.
+
+    Args:
+        features (array-like or sparse matrix): The input features.
+        radius (float): The maximum neighbor distance stored in the graph.
+
+    Returns:
+        scipy.sparse.csr_matrix: The radius neighbors graph of shape (n_samples, n_samples).
+    """
+    nn = NearestNeighbors(radius=radius, n_jobs=-1).fit(features)
+    return nn.radius_neighbors_graph(features, mode='distance', sort_results=True)
+
+
+# Process pool shared by every grid search, created once by start_grid_search_pool
+_grid_search_pool = None
+
+# Whether the numba kernels may run in parallel, only set in the grid search worker processes
+_worker_parallel = False
+
+
+def _init_grid_worker(numba_threads):
+    """
+    Set up a grid search worker process.
+
+    Ctrl+C is ignored, the server shuts the pool down itself. The numba kernels run in
+    parallel on numba_threads threads, so that all the workers together use about one
+    thread per CPU, or serially if that leaves a single thread per worker.
+    """
+    global _worker_parallel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # numba cannot use more threads than NUMBA_NUM_THREADS, the number of CPUs by default
+    numba_threads = min(numba_threads, numba_config.NUMBA_NUM_THREADS) if NUMBA_AVAILABLE else 1
+    if numba_threads > 1:
+        set_num_threads(numba_threads)
+        _worker_parallel = True
+
+
+def start_grid_search_pool(max_workers=None):
+    """
+    Create the process pool used to evaluate the grid search combinations in parallel.
+
+    It should be called once, from the main thread, before serving requests. Until it
+    is, the combinations are evaluated in the calling process.
+
+    Args:
+        max_workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+    """
+    global _grid_search_pool
+    if _grid_search_pool is None:
+        cpu_count = os.cpu_count() or 1
+        max_workers = max_workers or cpu_count
+        _grid_search_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=_MP_CONTEXT,
+                                                initializer=_init_grid_worker,
+                                                initargs=(max(1, cpu_count // max_workers),))
+
+
+def shutdown_grid_search_pool():
+    """
+    Shut down the grid search process pool, waiting for running evaluations to finish.
+    """
+    global _grid_search_pool
+    if _grid_search_pool is not None:
+        _grid_search_pool.shutdown()
+        _grid_search_pool = None
+
+
+def _evaluate_dbscan_params(features, graph, eps, min_samples):
+    """
+    Fit DBSCAN with a single (eps, min_samples) combination and evaluate the clustering.
+
+    Args:
+        features (array-like or sparse matrix): The input features to cluster.
+        graph (scipy.sparse.csr_matrix): The radius neighbors graph of the features, for a
+            radius of at least eps.
+        eps (float): The eps parameter to evaluate.
+        min_samples (int): The min_samples parameter to evaluate.
+
+    Returns:
+        tuple: A tuple containing:
+            - dict: The grid search result for this combination.
+            - array: The cluster labels.
+            - float: The silhouette score, or -inf if the clustering could not be scored.
+    """
+    # Train DBSCAN with current parameters, reusing the precomputed neighbors graph
+    if _use_numba_dbscan(features):
+        cluster_labels = _dbscan_numba(graph, eps, min_samples, parallel=_worker_parallel)
+    else:
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed', n_jobs=1)
+        cluster_labels = dbscan.fit_predict(graph)
+
+    # Calculate metrics if there are at least 2 clusters (excluding noise)
+    unique_labels = np.unique(cluster_labels)
+    n_clusters = len(unique_labels[unique_labels != -1])
+
+    metrics_results = {}
+    current_score = -np.inf
+
+    if n_clusters >= 2:
+        # Filter out noise points for metric calculation
+        noise_mask = cluster_labels != -1
+        features_no_noise = features[noise_mask]
+        labels_no_noise = cluster_labels[noise_mask]
+
+        # Only calculate metrics if we have enough samples without noise
+        if features_no_noise.shape[0] > n_clusters:
+            try:
+                sil_score = metrics.silhouette_score(features_no_noise, labels_no_noise)
+                # These scores do not accept sparse input
+                if sparse.issparse(features_no_noise):
+                    features_no_noise = features_no_noise.toarray()
+                ch_score = metrics.calinski_harabasz_score(features_no_noise, labels_no_noise)
+                db_score = metrics.davies_bouldin_score(features_no_noise, labels_no_noise)
+
+
+                metrics_results = {
+                    'silhouette_score': float(sil_score),
+                    'calinski_harabasz_score': float(ch_score),
+                    'davies_bouldin_score': float(db_score)
+                }
+
+                # Use silhouette score as the primary metric for parameter selection
+                current_score = sil_score
+            except Exception as e:
+                metrics_results = {'error': str(e)}
+
+    # Track results for this parameter combination
+    combo_result = {
+        'eps': eps,
+        'min_samples': min_samples,
+        'n_clusters': int(n_clusters),
+        'n_noise_points': int(np.sum(cluster_labels == -1)),
+        'metrics': metrics_results
+    }
+
+    return combo_result, cluster_labels, current_score
 
 
 def find_best_dbscan_params(features,eps_range,min_samples_range):
@@ -14,9 +355,14 @@ def find_best_dbscan_params(features,eps_range,min_samples_range):
     This function performs a grid search over the specified ranges of eps and
     min_samples parameters for DBSCAN clustering. It evaluates the clustering
     performance using silhouette score and returns the best parameters found.
+    The neighbors of every point only depend on eps, so a single radius neighbors
+    graph is computed for the largest eps and shared by every combination.
+    Parameter combinations are independent, so they are evaluated in parallel
+    in the pool of worker processes created by start_grid_search_pool. For large feature sets, a numba DBSCAN
+    implementation is used when numba is installed.
 
     Args:
-        features (array-like): The input features to cluster.
+        features (array-like or sparse matrix): The input features to cluster.
         eps_range (list): A list of float values to try for the eps parameter.
         min_samples_range (list): A list of integer values to try for the min_samples parameter.
 
@@ -33,74 +379,43 @@ def find_best_dbscan_params(features,eps_range,min_samples_range):
     best_params = {'eps': eps_range[0], 'min_samples': min_samples_range[0]}
     best_labels = None
     grid_search_results = []
-    
+    all_labels = []
+
     # Define parameter combinations for grid search
     param_combinations = list(itertools.product(eps_range, min_samples_range))
-    
-    for eps, min_samples in param_combinations:
-        # Train DBSCAN with current parameters
-        dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-        cluster_labels = dbscan.fit_predict(features)
-        
-        # Calculate metrics if there are at least 2 clusters (excluding noise)
-        unique_labels = np.unique(cluster_labels)
-        n_clusters = len(unique_labels[unique_labels != -1])
-        
-        metrics_results = {}
-        current_score = -np.inf
-        
-        if n_clusters >= 2:
-            # Filter out noise points for metric calculation
-            noise_mask = cluster_labels != -1
-            features_no_noise = features[noise_mask]
-            labels_no_noise = cluster_labels[noise_mask]
-            
-            # Only calculate metrics if we have enough samples without noise
-            if len(features_no_noise) > n_clusters:
-                try:
-                    sil_score = metrics.silhouette_score(features_no_noise, labels_no_noise)
-                    ch_score = metrics.calinski_harabasz_score(features_no_noise, labels_no_noise)
-                    db_score = metrics.davies_bouldin_score(features_no_noise, labels_no_noise)
-                    
-                    
-                    metrics_results = {
-                        'silhouette_score': float(sil_score),
-                        'calinski_harabasz_score': float(ch_score),
-                        'davies_bouldin_score': float(db_score)
-                    }
-                    
-                    # Use silhouette score as the primary metric for parameter selection
-                    current_score = sil_score
-                except Exception as e:
-                    metrics_results = {'error': str(e)}
-        
-        # Track results for this parameter combination
-        combo_result = {
-            'eps': eps,
-            'min_samples': min_samples,
-            'n_clusters': int(n_clusters),
-            'n_noise_points': int(np.sum(cluster_labels == -1)),
-            'metrics': metrics_results
-        }
-        
+    eps_values, min_samples_values = zip(*param_combinations)
+
+    # Compute the neighborhoods once, for the largest eps
+    graph = _radius_neighbors_graph(features, max(eps_range))
+
+    # The features and the graph are sent along with each combination
+    if _grid_search_pool is not None and len(param_combinations) > 1:
+        results = list(_grid_search_pool.map(_evaluate_dbscan_params, itertools.repeat(features),
+                                             itertools.repeat(graph), eps_values, min_samples_values))
+    else:
+        results = list(map(_evaluate_dbscan_params, itertools.repeat(features),
+                           itertools.repeat(graph), eps_values, min_samples_values))
+
+    for combo_result, cluster_labels, current_score in results:
         grid_search_results.append(combo_result)
-        
+        all_labels.append(cluster_labels)
+
         # Update best parameters if we found a better score
         if current_score > best_score:
             best_score = current_score
-            best_params = {'eps': eps, 'min_samples': min_samples}
+            best_params = {'eps': combo_result['eps'], 'min_samples': combo_result['min_samples']}
             best_labels = cluster_labels
-    
+
     # If no valid clustering was found (e.g., all noise), use the parameters with the most clusters
     if best_labels is None or np.all(best_labels == -1):
-        most_clusters = max(grid_search_results, 
-                          key=lambda x: (x['n_clusters'], -x['n_noise_points']))
-        best_params = {'eps': most_clusters['eps'], 'min_samples': most_clusters['min_samples']}
-        
-        # Rerun DBSCAN with the selected parameters
-        dbscan = DBSCAN(eps=best_params['eps'], min_samples=best_params['min_samples'])
-        best_labels = dbscan.fit_predict(features)
-    
+        most_clusters = max(range(len(grid_search_results)),
+                          key=lambda i: (grid_search_results[i]['n_clusters'], -grid_search_results[i]['n_noise_points']))
+        best_params = {'eps': grid_search_results[most_clusters]['eps'],
+                       'min_samples': grid_search_results[most_clusters]['min_samples']}
+
+        # Reuse the labels computed during the grid search
+        best_labels = all_labels[most_clusters]
+
     return best_params, grid_search_results, best_labels, best_score
 
 
@@ -130,7 +445,7 @@ class CustomMFA(BaseEstimator, TransformerMixin):
         Fit the CustomMFA model on the dataset X.
 
         Parameters:
-        - X: array-like of shape (n_samples, n_features)
+        - X: array-like or sparse matrix of shape (n_samples, n_features)
             The input data to fit.
         - y: Ignored. Present for compatibility with scikit-learn pipelines.
 
@@ -138,7 +453,7 @@ class CustomMFA(BaseEstimator, TransformerMixin):
         - self: object
             Returns the instance itself.
         """
-        X = np.asarray(X)
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
         self.group_weights_ = []
         self.pca_per_group_ = []
         self.group_normalized_data_ = []
@@ -168,14 +483,14 @@ class CustomMFA(BaseEstimator, TransformerMixin):
         Transform the dataset X using the fitted CustomMFA model.
 
         Parameters:
-        - X: array-like of shape (n_samples, n_features)
+        - X: array-like or sparse matrix of shape (n_samples, n_features)
             The input data to transform.
 
         Returns:
         - X_transformed: array-like of shape (n_samples, n_components_global)
             The transformed data.
         """
-        X = np.asarray(X)
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
         group_norm = []
         # Normalize each group using the learned weights
         for group, weight in zip(self.groups, self.group_weights_):
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
+
+
+def _open_csv_stream(file, convert_options):
+    """
+    Open an Arrow streaming CSV reader on file, with column types inferred from the first block.
+
+    Columns Arrow infers as dates, times or timestamps are re-read as strings, so their
+    values keep their original text, and columns that are empty in the first block are
+    re-read as floats, like with pandas.read_csv.
+
+    Raises:
+        ValueError: If a column of the first block is not valid UTF-8 text.
+    """
+    # Quoted values may span several lines, as is common in free-text columns
+    parse_options = pacsv.ParseOptions(newlines_in_values=True)
+
+    file.seek(0)
+    reader = pacsv.open_csv(pa.PythonFile(file, mode='r'), parse_options=parse_options,
+                            convert_options=convert_options)
+
+    column_types = {}
+    for field in reader.schema:
+        if pa.types.is_binary(field.type):
+            reader.close()
+            raise ValueError(f"Column '{field.name}' is not valid UTF-8 text")
+        if pa.types.is_temporal(field.type):
+            column_types[field.name] = pa.string()
+        elif pa.types.is_null(field.type):
+            column_types[field.name] = pa.float64()
+
+    if column_types:
+        reader.close()
+        convert_options.column_types = column_types
+        file.seek(0)
+        reader = pacsv.open_csv(pa.PythonFile(file, mode='r'), parse_options=parse_options,
+                                convert_options=convert_options)
+    return reader
+
+
+def read_csv_file(file):
+    """
+    Parse a CSV file object into a pandas DataFrame using Arrow's streaming CSV reader.
+
+    The file is read and parsed incrementally, one block at a time, so the raw upload is
+    never held in memory as a whole next to the parsed data. The table is then converted
+    to pandas while releasing the Arrow buffers as they are consumed.
+
+    Arrow is stricter than pandas: column types are inferred from the first block only,
+    and rows with a missing field are rejected. If Arrow cannot parse the file, it is
+    parsed again with pandas.read_csv, which infers types over the whole content and
+    pads short rows with missing values.
+
+    Args:
+        file (file-like): A binary, seekable file object containing UTF-8 encoded CSV data.
+
+    Returns:
+        pandas.DataFrame: The parsed data.
+
+    Raises:
+        ValueError: If the file is not valid UTF-8 text.
+    """
+    # Treat empty strings as missing values, like pandas.read_csv
+    convert_options = pacsv.ConvertOptions(strings_can_be_null=True)
+
+    try:
+        reader = _open_csv_stream(file, convert_options)
+        table = pa.Table.from_batches(list(reader), schema=reader.schema)
+    except pa.ArrowInvalid:
+        file.seek(0)
+        return pd.read_csv(file)
+
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+
+    # Arrow yields None for missing values in object columns, pandas.read_csv and the
+    # scikit-learn imputers expect NaN
+    object_cols = df.columns[df.dtypes == object]
+    df[object_cols] = df[object_cols].where(df[object_cols].notna(), np.nan)
+    return df
@@ -0,0 +1,275 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import torch
+from helpers.cache_helpers import text_hash
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:  # faiss is optional, exact search is used without it
+    FAISS_AVAILABLE = False
+
+# Number of embedding rows upcast to float32 at a time when scoring a query
+SCORE_BLOCK_SIZE = 16384
+
+# File name of the optimized graph written by ORTOptimizer
+ONNX_MODEL_FILE = 'model_optimized.onnx'
+
+
+def quantize_model(model):
+    """
+    Apply dynamic int8 quantization to the Linear layers of a SentenceTransformer.
+
+    Weights are stored as int8 and activations are quantized on the fly, which speeds
+    up CPU inference (notably on CPUs with VNNI support) at a small cost in accuracy.
+
+    Args:
+        model (SentenceTransformer): The model to quantize. It is modified in place.
+
+    Returns:
+        SentenceTransformer: The quantized model.
+    """
+    transformer = model[0]
+    quantized = torch.ao.quantization.quantize_dynamic(
+        transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    # Newer sentence-transformers versions expose auto_model as a read-only property over model
+    if isinstance(getattr(type(transformer), 'auto_model', None), property):
+        transformer.model = quantized
+    else:
+        transformer.auto_model = quantized
+    return model
+
+
+class OnnxSentenceEncoder:
+    """
+    An ONNX Runtime replacement for SentenceTransformer.encode.
+
+    The Hugging Face model is exported to ONNX once, graph-optimized (operator fusion,
+    constant folding) and persisted to disk; later instances load the optimized graph
+    directly. Texts are tokenized with the fast tokenizer, mean-pooled over the attention
+    mask and optionally L2-normalized in NumPy, matching the sentence-transformers pipeline.
+
+    Requires the optional `optimum[onnxruntime]` package.
+    """
+    def __init__(self, model_id, model_dir, max_seq_length=256, optimization_level=2):
+        """
+        Parameters:
+        - model_id: Hugging Face id of the model to export (e.g. 'sentence-transformers/all-MiniLM-L6-v2').
+        - model_dir: directory where the optimized ONNX model is stored and loaded from.
+        - max_seq_length: maximum number of tokens per text; longer texts are truncated.
+        - optimization_level: ONNX Runtime graph optimization level (1-3).
+        """
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer
+        from optimum.onnxruntime.configuration import OptimizationConfig
+        from transformers import AutoTokenizer
+
+        if not os.path.isfile(os.path.join(model_dir, ONNX_MODEL_FILE)):
+            # Export next to model_dir and move it into place once complete, so an interrupted
+            # export never leaves a partial model behind
+            parent_dir = os.path.dirname(os.path.abspath(model_dir))
+            os.makedirs(parent_dir, exist_ok=True)
+            export_dir = tempfile.mkdtemp(dir=parent_dir)
+            try:
+                exported = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+                optimizer = ORTOptimizer.from_pretrained(exported)
+                optimizer.optimize(save_dir=export_dir,
+                                   optimization_config=OptimizationConfig(optimization_level=optimization_level))
+                AutoTokenizer.from_pretrained(model_id).save_pretrained(export_dir)
+                shutil.rmtree(model_dir, ignore_errors=True)
+                os.replace(export_dir, model_dir)
+            finally:
+                shutil.rmtree(export_dir, ignore_errors=True)
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=ONNX_MODEL_FILE)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = max_seq_length
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True,
+               normalize_embeddings=False):
+        """
+        Encode sentences into embeddings.
+
+        Sentences are sorted by length before batching to minimize padding, and the
+        embeddings are returned in the original order. The signature mirrors
+        SentenceTransformer.encode; show_progress_bar and convert_to_numpy are accepted
+        for compatibility, and the result is always a NumPy array.
+
+        Parameters:
+        - sentences: list of texts to encode.
+        - batch_size: number of texts per forward pass.
+        - normalize_embeddings: whether to L2-normalize the embeddings.
+
+        Returns:
+        - embeddings: float32 array of shape (len(sentences), embedding_dim).
+        """
+        order = np.argsort([-len(str(sentence)) for sentence in sentences], kind='stable')
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            batch = [str(sentences[i]) for i in order[start:start + batch_size]]
+            inputs = self.tokenizer(batch, padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors='np')
+            token_embeddings = self.model(**inputs).last_hidden_state
+            # Mean pooling over the non-padding tokens
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            batches.append((token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        # Restore the original order of the sentences
+        sorted_embeddings = np.vstack(batches).astype(np.float32)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+
+def encode_with_cache(model, model_name, texts, cache, batch_size=64):
+    """
+    Encode texts into embeddings, reusing vectors already stored in the cache.
+
+    Texts are keyed by the model name and the SHA-256 of their content, so only new
+    texts are encoded, once each. Embeddings are L2-normalized and stored as float16.
+
+    Args:
+        model (SentenceTransformer): The model used to encode cache misses.
+        model_name (str): Name of the model, used as the cache key prefix.
+        texts (list): The texts to encode.
+        cache (LRUCache): The cache holding previously computed embeddings.
+        batch_size (int): Batch size used when encoding cache misses.
+
+    Returns:
+        numpy.ndarray: A float16 array of shape (len(texts), embedding_dim), in the same order as texts.
+    """
+    keys = [f"{model_name}:{text_hash(text)}" for text in texts]
+
+    # Look up and encode each distinct text only once
+    unique_texts = {}
+    for key, text in zip(keys, texts):
+        unique_texts.setdefault(key, text)
+    vectors = {key: cache.get(key) for key in unique_texts}
+
+    miss_keys = [key for key, vector in vectors.items() if vector is None]
+    if miss_keys:
+        with torch.inference_mode():
+            new_embeddings = model.encode(
+                [unique_texts[key] for key in miss_keys],
+                batch_size=batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        for key, embedding in zip(miss_keys, new_embeddings):
+            embedding = embedding.astype(np.float16)
+            cache.put(key, embedding)
+            vectors[key] = embedding
+
+    # Scatter the embeddings back to the original order, duplicates included
+    return np.vstack([vectors[key] for key in keys])
+
+
+def encode_query(model, text):
+    """
+    Encode a single query text into a normalized embedding.
+
+    Args:
+        model (SentenceTransformer): The model used to encode the query.
+        text (str): The query text.
+
+    Returns:
+        numpy.ndarray: The float32 query embedding of shape (embedding_dim,).
+    """
+    with torch.inference_mode():
+        return model.encode([text], batch_size=1, show_progress_bar=False,
+                            convert_to_numpy=True, normalize_embeddings=True)[0]
+
+
+def top_k_similar(embeddings, query_embedding, k):
+    """
+    Find the k embeddings most similar to the query.
+
+    The corpus embeddings are expected to be L2-normalized once at encoding time;
+    the query is normalized here, so the cosine similarity is a float32 matrix-vector
+    product (BLAS gemv). Float16 embeddings are upcast one block of rows at a time,
+    which keeps the corpus at half size in memory without a full float32 copy. The
+    top k are selected with np.argpartition in linear time and only those k are sorted.
+
+    Args:
+        embeddings (numpy.ndarray): Normalized float16 or float32 corpus embeddings of shape
+            (n_samples, embedding_dim).
+        query_embedding (numpy.ndarray): Query embedding of shape (embedding_dim,).
+        k (int): The number of most similar items to return.
+
+    Returns:
+        tuple: A tuple containing:
+            - numpy.ndarray: Indices of the k most similar items, most similar first.
+            - numpy.ndarray: The similarity scores for those indices.
+    """
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    query_embedding = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+
+    similarities = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), SCORE_BLOCK_SIZE):
+        block = np.ascontiguousarray(embeddings[start:start + SCORE_BLOCK_SIZE], dtype=np.float32)
+        similarities[start:start + len(block)] = block @ query_embedding
+    k = max(0, min(k, len(similarities)))
+
+    if k < len(similarities):
+        top_indices = np.argpartition(-similarities, k - 1)[:k] if k else np.empty(0, dtype=np.intp)
+    else:
+        top_indices = np.arange(len(similarities))
+    top_indices = top_indices[np.argsort(-similarities[top_indices], kind='stable')]
+
+    return top_indices, similarities[top_indices]
+
+
+def build_ann_index(embeddings, hnsw_m=32):
+    """
+    Build an approximate nearest neighbor index over normalized embeddings.
+
+    The index is a FAISS HNSW graph using inner product, which equals the cosine
+    similarity for normalized vectors. Queries then cost roughly O(log N) instead of
+    scoring the whole corpus. Requires the optional `faiss-cpu` package.
+
+    Args:
+        embeddings (numpy.ndarray): Normalized corpus embeddings of shape (n_samples, embedding_dim).
+        hnsw_m (int): Number of neighbors per node in the HNSW graph.
+
+    Returns:
+        faiss.IndexHNSWFlat: The populated index.
+    """
+    index = faiss.IndexHNSWFlat(embeddings.shape[1], hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+    return index
+
+
+def ann_top_k_similar(index, query_embedding, k, ef_search=64):
+    """
+    Find the approximately k most similar embeddings to the query using an HNSW index.
+
+    Args:
+        index (faiss.IndexHNSWFlat): An index built with build_ann_index.
+        query_embedding (numpy.ndarray): Query embedding of shape (embedding_dim,).
+        k (int): The number of most similar items to return.
+        ef_search (int): Minimum size of the HNSW candidate list; raised to k if smaller.
+
+    Returns:
+        tuple: A tuple containing:
+            - numpy.ndarray: Indices of the k most similar items, most similar first.
+            - numpy.ndarray: The similarity scores for those indices.
+    """
+    k = max(0, min(k, index.ntotal))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    query_embedding = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+
+    search_params = faiss.SearchParametersHNSW(efSearch=max(ef_search, k))
+    scores, indices = index.search(query_embedding[None, :], k, params=search_params)
+
+    # FAISS pads with -1 when fewer than k neighbors are found
+    found = indices[0] >= 0
+    return indices[0][found], scores[0][found]
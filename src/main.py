@@ -1,26 +1,83 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.impute import SimpleImputer
-from helpers.clustering_helpers import find_best_dbscan_params, CustomMFA
+from helpers.clustering_helpers import (find_best_dbscan_params, split_column_types, preprocess_features,
+                                       start_grid_search_pool, shutdown_grid_search_pool)
+from helpers.similarity_helpers import (encode_with_cache, encode_query, top_k_similar, quantize_model, OnnxSentenceEncoder,
+                                       build_ann_index, ann_top_k_similar, FAISS_AVAILABLE)
+from helpers.cache_helpers import LRUCache, frame_hash
+from helpers.io_helpers import read_csv_file
 from sklearn import metrics
 from sentence_transformers import SentenceTransformer
-import io
-import json
-from pydantic import BaseModel
-from sklearn.pipeline import Pipeline
+import torch
+import os
+import warnings
+from pydantic import BaseModel, Field
 from sklearn.decomposition import PCA
 
 # Initialize FastAPI app
 app = FastAPI(title="Data Analysis API",
-              description="API for clustering and similarity search operations")
+              description="API for clustering and similarity search operations",
+              default_response_class=ORJSONResponse)
 
 
+# Let torch use every core for intra-op parallelism, with a single inter-op thread. This
+# module can be imported several times per process (`python main.py`, then uvicorn), and
+# torch only accepts the inter-op setting once
+torch.set_num_threads(os.cpu_count() or 1)
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    pass
+
 # Initialize the sentence transformer model for embeddings
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+BACKEND = os.environ.get('BACKEND', 'torch')
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR',
+                                os.path.expanduser(f'~/.cache/curotec_task/onnx/{MODEL_NAME}'))
+
+# Loaded by the startup hook, so that processes importing this module (such as the
+# grid search workers) do not load the model
+model = None
+
+
+def load_model():
+    """
+    Load the embedding model for the configured backend.
+    """
+    if BACKEND == 'onnx':
+        try:
+            # Serve the model through ONNX Runtime with an optimized graph (BACKEND=onnx)
+            return OnnxSentenceEncoder(f'sentence-transformers/{MODEL_NAME}', ONNX_MODEL_DIR)
+        except Exception as e:
+            # Missing packages, a failed export or a corrupted model directory all fall back
+            warnings.warn(f"ONNX backend unavailable ({e!r}), falling back to sentence-transformers")
+
+    st_model = SentenceTransformer(MODEL_NAME)
+
+    # Optionally quantize the model to int8 for faster CPU inference (ST_QUANTIZE=1)
+    if os.environ.get('ST_QUANTIZE') == '1':
+        try:
+            st_model = quantize_model(st_model)
+        except Exception as e:
+            warnings.warn(f"Quantization failed ({e!r}), serving the unquantized model")
+    return st_model
+
+
+# Cache of text embeddings shared across requests, keyed by model name and text hash
+EMBEDDING_CACHE_SIZE = 100_000
+embedding_cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+
+# Approximate nearest neighbor indexes are built on request (use_ann, requires faiss),
+# and cached by the content of the text column
+ANN_INDEX_CACHE_SIZE = 8
+ann_index_cache = LRUCache(maxsize=ANN_INDEX_CACHE_SIZE)
+
+# Cache of preprocessed clustering features, keyed by data content, column types and parameters
+FEATURES_CACHE_SIZE = 16
+features_cache = LRUCache(maxsize=FEATURES_CACHE_SIZE)
 
 
 class ClusteringParams(BaseModel):
@@ -30,12 +87,36 @@ class ClusteringParams(BaseModel):
     max_grid_search_combinations: Optional[int] = 9  # Limit grid search combinations
     n_components_global: Optional[int] = 2  # Number of global components for MFA
     do_mfa: Optional[bool] = False
+    reduce_dims: Optional[int] = Field(None, gt=0)  # Number of dimensions kept with a truncated SVD when MFA is not used
 
 
 class SimilarityParams(BaseModel):
     text_column: str  # Column containing text to embed
     query_text: str = None  # Optional text to compare against
     top_k: int = 5  # Number of most similar items to return
+    batch_size: int = 64  # Number of texts encoded per forward pass
+    use_ann: bool = False  # Search an approximate HNSW index (requires faiss) instead of scoring every item
+
+
+@app.on_event("startup")
+def startup():
+    """
+    Load the model and start the grid search worker processes from the main thread.
+
+    One forward pass is run so the first request does not pay for lazy initialization.
+    """
+    global model
+    model = load_model()
+    encode_query(model, "warmup")
+    start_grid_search_pool()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """
+    Stop the grid search worker processes.
+    """
+    shutdown_grid_search_pool()
 
 
 @app.get("/")
@@ -43,6 +124,94 @@ async def root():
     return {"message": "Welcome to the Data Analysis API. Use /clustering or /similarity endpoints."}
 
 
+def _run_clustering(csv_file, params):
+    """
+    Parse the uploaded CSV file and run the clustering, returning the /clustering response.
+
+    This is blocking file I/O and CPU-bound work, so it is run in a worker thread to keep
+    the event loop free.
+    """
+    # Stream the uploaded CSV file into a pandas DataFrame
+    df = read_csv_file(csv_file)
+
+    # Define parameters
+    if params is None:
+        params = ClusteringParams()
+
+    # Extract column names
+    columns = df.columns.tolist()
+
+    # Separate label column if specified
+    labels_true = None
+    if params.label_column_index is not None:
+        if params.label_column_index >= len(columns):
+            raise HTTPException(
+                status_code=400, detail=f"Invalid label column index. Must be smaller than {len(columns)-1}")
+
+        label_column = columns[params.label_column_index]
+        labels_true = df[label_column].to_numpy()
+        df = df.drop(columns=[label_column])
+        columns.remove(label_column)
+
+    numeric_cols, categorical_cols = split_column_types(df, columns)
+
+    # Reuse the preprocessed features when the same data and parameters were seen before
+    features_key = (frame_hash(df), tuple(numeric_cols), tuple(categorical_cols),
+                    params.do_mfa, params.n_components_global, params.reduce_dims)
+    features_scaled = features_cache.get(features_key)
+    if features_scaled is None:
+        features_scaled = preprocess_features(df, numeric_cols, categorical_cols,
+                                              do_mfa=params.do_mfa,
+                                              n_components_global=params.n_components_global,
+                                              reduce_dims=params.reduce_dims)
+        features_cache.put(features_key, features_scaled)
+
+    best_params, grid_search_results, best_labels, best_silhouette_score = find_best_dbscan_params(
+        features=features_scaled,
+        eps_range=params.eps_range,
+        min_samples_range=params.min_samples_range
+    )
+    all_cluster_ids = np.unique(best_labels)
+
+    additional_metrics = {}
+    if labels_true is not None:
+        try:
+            # Calculate the requested metrics
+            additional_metrics = {
+                "homogeneity": metrics.homogeneity_score(labels_true, best_labels),
+                "completeness": metrics.completeness_score(labels_true, best_labels),
+                "v_measure": metrics.v_measure_score(labels_true, best_labels),
+                "adjusted_rand_index": metrics.adjusted_rand_score(labels_true, best_labels),
+                "adjusted_mutual_information": metrics.adjusted_mutual_info_score(labels_true, best_labels),
+            }
+        except Exception as e:
+            additional_metrics = {"error": str(e)}
+    # Return results, serialized by orjson which handles numpy scalars natively
+    response = {
+        "message": "Enhanced clustering completed successfully",
+        "preprocessing": {
+            "rows_before_processing": len(df),
+            "numeric_columns": numeric_cols,
+            "categorical_columns": categorical_cols,
+            "label_column": label_column if params.label_column_index else None
+        },
+        "grid_search": {
+            "parameter_combinations_tested": len(grid_search_results),
+            "best_parameters": best_params,
+            "all_results": grid_search_results
+        },
+        "clustering_results": {
+            "number_of_clusters": len(all_cluster_ids[all_cluster_ids != -1]),
+            "noise_points": np.sum(best_labels == -1),
+            "noise_percentage": np.sum(best_labels == -1) / len(df) * 100,
+            "silhouette_coefficient": best_silhouette_score,
+            "additional_metrics": additional_metrics
+        }
+    }
+
+    return ORJSONResponse(response)
+
+
 @app.post("/clustering")
 async def perform_clustering(
     file: UploadFile = File(...),
@@ -85,129 +254,86 @@ async def perform_clustering(
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
     try:
-        # Read the CSV file into a pandas DataFrame
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-
-        # Define parameters
-        if params is None:
-            params = ClusteringParams()
-
-        # Extract column names
-        columns = df.columns.tolist()
-
-        # Separate label column if specified
-        labels_true = None
-        if params.label_column_index is not None:
-            if params.label_column_index >= len(columns):
-                raise HTTPException(
-                    status_code=400, detail=f"Invalid label column index. Must be smaller than {len(columns)-1}")
-
-            label_column = columns[params.label_column_index]
-            labels_true = df[label_column].copy()
-            df = df.drop(columns=[label_column])
-            columns.remove(label_column)
-
-        numeric_cols = []
-        categorical_cols = []
-        for column in columns:
-            try:
-                # Try to convert the column to numeric
-                pd.to_numeric(df[column])
-                numeric_cols.append(column)
-            except ValueError:
-                categorical_cols.append(column)
-
-        # Create preprocessing pipeline
-        categorical_pipeline = Pipeline(steps=[
-            ('imputer', SimpleImputer(strategy='most_frequent')),  # Use most frequent for categorical data
-            ('encoder', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
-        ])
-
-        numerical_pipeline = Pipeline(steps=[
-            ('imputer', SimpleImputer(strategy='mean')),
-            ('scaler', StandardScaler())
-        ])
-
-        # Create the full preprocessing pipeline
-        preprocessor = ColumnTransformer(
-            transformers=[
-                ('num', numerical_pipeline, numeric_cols),
-                ('cat', categorical_pipeline, categorical_cols)
-            ],
-            remainder='drop'
-        )
-
-        # Fit and transform the data using the preprocessing pipeline
-        features_scaled = preprocessor.fit_transform(df)
-
-        if params.do_mfa:
-            n_numeric = len(numeric_cols)
-            n_cat_encoded = features_scaled.shape[1]- n_numeric
-            group_numeric = np.arange(0, n_numeric)
-            group_cat = np.arange(n_numeric, n_numeric + n_cat_encoded)
-            groups = [group_numeric, group_cat]
-
-            mfa_pipeline = Pipeline([
-                ('preprocessor', preprocessor),
-                ('mfa', CustomMFA(groups=groups, n_components_global=params.n_components_global))
-            ])
-
-            features_scaled = mfa_pipeline.fit_transform(df)
-
-        best_params, grid_search_results, best_labels, best_silhouette_score = find_best_dbscan_params(
-            features=features_scaled,
-            eps_range=params.eps_range,
-            min_samples_range=params.min_samples_range
-        )
-        all_cluster_ids = np.unique(best_labels)
-
-        # Add cluster labels to the dataframe
-        result_df = df.copy()
-        result_df['cluster'] = best_labels
-
-        additional_metrics = {}
-        if labels_true is not None:
-            try:
-                # Calculate the requested metrics
-                additional_metrics = {
-                    "homogeneity": float(metrics.homogeneity_score(labels_true, best_labels)),
-                    "completeness": float(metrics.completeness_score(labels_true, best_labels)),
-                    "v_measure": float(metrics.v_measure_score(labels_true, best_labels)),
-                    "adjusted_rand_index": float(metrics.adjusted_rand_score(labels_true, best_labels)),
-                    "adjusted_mutual_information": float(metrics.adjusted_mutual_info_score(labels_true, best_labels)),
-                }
-            except Exception as e:
-                additional_metrics = {"error": str(e)}
-        # Return results
-        response = {
-            "message": "Enhanced clustering completed successfully",
-            "preprocessing": {
-                "rows_before_processing": len(df),
-                "numeric_columns": numeric_cols,
-                "categorical_columns": categorical_cols,
-                "label_column": label_column if params.label_column_index else None
-            },
-            "grid_search": {
-                "parameter_combinations_tested": len(grid_search_results),
-                "best_parameters": best_params,
-                "all_results": grid_search_results
-            },
-            "clustering_results": {
-                "number_of_clusters": len(all_cluster_ids[all_cluster_ids != -1]),
-                "noise_points": int(np.sum(best_labels == -1)),
-                "noise_percentage": float(np.sum(best_labels == -1) / len(result_df) * 100),
-                "silhouette_coefficient": best_silhouette_score,
-                "additional_metrics": additional_metrics
-            }
-        }
-
-        return response
+        # Read and process the upload in a worker thread, streaming it from the spooled file
+        return await run_in_threadpool(_run_clustering, file.file, params)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during clustering: {str(e)}")
 
 
+def _run_similarity_search(csv_file, params):
+    """
+    Parse the uploaded CSV file, embed the texts and run the search, returning the /similarity response.
+
+    This is blocking file I/O and CPU-bound work, so it is run in a worker thread to keep
+    the event loop free.
+    """
+    # Stream the uploaded CSV file into a pandas DataFrame
+    df = read_csv_file(csv_file)
+
+    # Verify the text column exists
+    if params.text_column not in df.columns:
+        raise HTTPException(status_code=400, detail=f"Text column '{params.text_column}' not found in dataset")
+
+    # Remove rows with missing text
+    df = df.dropna(subset=[params.text_column])
+
+    if df.empty:
+        raise HTTPException(status_code=400, detail="No valid text data found in the specified column")
+
+    # Create embeddings for the text column, only encoding texts not seen before
+    texts = df[params.text_column].tolist()
+    embeddings = encode_with_cache(model, MODEL_NAME, texts, embedding_cache,
+                                   batch_size=params.batch_size)
+
+    # If query text is provided, find similar items
+    if params.query_text:
+        # Encode the query
+        query_embedding = encode_query(model, params.query_text)
+
+        if params.use_ann and FAISS_AVAILABLE:
+            # Search an HNSW index, built once per distinct corpus and reused by later queries
+            index_key = f"{MODEL_NAME}:{frame_hash(df[[params.text_column]])}"
+            index = ann_index_cache.get(index_key)
+            if index is None:
+                index = build_ann_index(embeddings)
+                ann_index_cache.put(index_key, index)
+            top_indices, top_scores = ann_top_k_similar(index, query_embedding, params.top_k)
+        else:
+            # Score every item against the query and select the top k
+            top_indices, top_scores = top_k_similar(embeddings, query_embedding, params.top_k)
+
+        # Convert all the matched rows at once, with missing values as None
+        top_rows = df.iloc[top_indices]
+        original_rows = top_rows.astype(object).where(top_rows.notna(), None).to_dict(orient='records')
+
+        # Create result with similarities
+        similar_items = []
+        for idx, score, original_row in zip(top_indices, top_scores, original_rows):
+            similar_items.append({
+                "index": idx,
+                "text": texts[idx],
+                "similarity_score": score,
+                "original_row": original_row
+            })
+
+        return ORJSONResponse({
+            "message": "Similarity search completed successfully",
+            "query": params.query_text,
+            "similar_items": similar_items
+        })
+
+    # Otherwise just return info about the embedding process
+    else:
+        return ORJSONResponse({
+            "message": "Vector embeddings created successfully",
+            "total_records": len(df),
+            "embedding_dimensions": embeddings.shape[1],
+            "text_column": params.text_column,
+            "note": "Submit a query_text parameter to perform similarity search"
+        })
+
+
 @app.post("/similarity")
 async def perform_similarity_search(
     file: UploadFile = File(...),
@@ -222,60 +348,8 @@ async def perform_similarity_search(
         raise HTTPException(status_code=400, detail="Parameters required: at least text_column must be specified")
 
     try:
-        # Read the CSV file
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-
-        # Verify the text column exists
-        if params.text_column not in df.columns:
-            raise HTTPException(status_code=400, detail=f"Text column '{params.text_column}' not found in dataset")
-
-        # Remove rows with missing text
-        df = df.dropna(subset=[params.text_column])
-
-        if df.empty:
-            raise HTTPException(status_code=400, detail="No valid text data found in the specified column")
-
-        # Create embeddings for the text column
-        texts = df[params.text_column].tolist()
-        embeddings = model.encode(texts)
-
-        # If query text is provided, find similar items
-        if params.query_text:
-            # Encode the query
-            query_embedding = model.encode([params.query_text])[0]
-
-            # Calculate similarity scores
-            similarities = metrics.pairwise.cosine_similarity([query_embedding], embeddings)[0]
-
-            # Get top k similar items
-            top_indices = similarities.argsort()[-params.top_k:][::-1]
-
-            # Create result with similarities
-            similar_items = []
-            for idx in top_indices:
-                similar_items.append({
-                    "index": int(idx),
-                    "text": texts[idx],
-                    "similarity_score": float(similarities[idx]),
-                    "original_row": json.loads(df.iloc[idx].to_json())
-                })
-
-            return {
-                "message": "Similarity search completed successfully",
-                "query": params.query_text,
-                "similar_items": similar_items
-            }
-
-        # Otherwise just return info about the embedding process
-        else:
-            return {
-                "message": "Vector embeddings created successfully",
-                "total_records": len(df),
-                "embedding_dimensions": embeddings.shape[1],
-                "text_column": params.text_column,
-                "note": "Submit a query_text parameter to perform similarity search"
-            }
+        # Read and process the upload in a worker thread, streaming it from the spooled file
+        return await run_in_threadpool(_run_similarity_search, file.file, params)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during similarity search: {str(e)}")
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+from sklearn.datasets import make_blobs
+
+from helpers.clustering_helpers import NUMBA_AVAILABLE, _radius_neighbors_graph
+
+if NUMBA_AVAILABLE:
+    from helpers.clustering_helpers import _dbscan_numba
+
+
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed")
+@pytest.mark.parametrize("parallel", [False, True])
+@pytest.mark.parametrize("eps, min_samples", [(0.3, 5), (0.8, 10), (1.5, 3)])
+def test_dbscan_numba_matches_sklearn(eps, min_samples, parallel):
+    features, _ = make_blobs(n_samples=600, centers=4, cluster_std=0.6, random_state=0)
+    graph = _radius_neighbors_graph(features, 1.5)
+
+    expected = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(graph)
+    labels = _dbscan_numba(graph, eps, min_samples, parallel=parallel)
+
+    np.testing.assert_array_equal(labels, expected)
@@ -0,0 +1,56 @@
+import io
+
+import pandas as pd
+import pytest
+
+from helpers.io_helpers import read_csv_file
+
+
+def _read_both(content):
+    return read_csv_file(io.BytesIO(content)), pd.read_csv(io.BytesIO(content))
+
+
+def test_type_change_after_first_block():
+    # Arrow infers an integer column from the first block, which is larger than 1 MB
+    content = b"id,value\n" + b"".join(b"%d,%d\n" % (i, i) for i in range(200_000)) + b"200000,text\n"
+    df, expected = _read_both(content)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["value"].iloc[-1] == "text"
+
+
+def test_dates_are_kept_as_text():
+    content = b"day,time,stamp\n2024-01-02,10:30:00,2024-01-02 10:30:00\n2024-02-03,,2024-02-03T11:00:00\n"
+    df, expected = _read_both(content)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["day"].tolist() == ["2024-01-02", "2024-02-03"]
+
+
+def test_ragged_rows():
+    content = b"a,b,c\n1,2,3\n4,5\n6,7,8\n"
+    df, expected = _read_both(content)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["c"].isna().tolist() == [False, True, False]
+
+
+def test_quoted_multiline_cells():
+    content = b'id,comment\n1,"first line\nsecond line"\n2,"a, b"\n3,\n'
+    df, expected = _read_both(content)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["comment"].iloc[0] == "first line\nsecond line"
+
+
+def test_empty_column_is_numeric():
+    content = b"a,b\n1,\n2,\n"
+    df, expected = _read_both(content)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["b"].dtype == "float64"
+
+
+def test_non_utf8_content_is_rejected():
+    with pytest.raises(ValueError):
+        read_csv_file(io.BytesIO("a,b\n1,caf\xe9\n".encode("latin-1")))
@@ -0,0 +1,45 @@
+import numpy as np
+
+from helpers.cache_helpers import LRUCache
+from helpers.similarity_helpers import encode_with_cache
+
+
+class FakeModel:
+    """
+    Deterministic stand-in for SentenceTransformer that records the texts it encodes.
+    """
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True,
+               normalize_embeddings=False):
+        self.encoded.append(list(sentences))
+        embeddings = np.array([[len(text), sum(map(ord, text)), 1.0] for text in sentences], dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+
+def test_encode_with_cache_dedupes_and_keeps_order():
+    model = FakeModel()
+    cache = LRUCache()
+    texts = ["b", "a", "b", "ccc", "a"]
+
+    embeddings = encode_with_cache(model, "fake", texts, cache)
+
+    # Each distinct text is encoded once, and the rows follow the input order
+    assert model.encoded == [["b", "a", "ccc"]]
+    expected = model.encode(texts, normalize_embeddings=True).astype(np.float16)
+    np.testing.assert_array_equal(embeddings, expected)
+    assert embeddings.dtype == np.float16
+
+
+def test_encode_with_cache_only_encodes_misses():
+    model = FakeModel()
+    cache = LRUCache()
+    first = encode_with_cache(model, "fake", ["a", "b"], cache)
+
+    second = encode_with_cache(model, "fake", ["c", "b", "a"], cache)
+
+    assert model.encoded == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(second[1:], first[::-1])